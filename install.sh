@@ -55,6 +55,13 @@ if ! ollama list 2>/dev/null | grep -q "qwen3:8b"; then
 fi
 echo "✓ qwen3:8b model ready"
 
+# Smaller model used for short transcripts
+if ! ollama list 2>/dev/null | grep -q "qwen3:4b"; then
+    echo "⏳ Downloading qwen3:4b model for short transcripts..."
+    ollama pull qwen3:4b
+fi
+echo "✓ qwen3:4b model ready"
+
 # Create virtual environment with correct Python version
 echo
 echo "⏳ Setting up Python environment..."
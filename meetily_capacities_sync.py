@@ -6,15 +6,26 @@ Reads transcript files (Meetily JSON or plain text), processes with AI, sends to
 
 import os
 import sys
+import io
 import json
 import time
+import hashlib
+import shutil
+import tempfile
+import subprocess
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 
 import argparse
 
+import ijson
 import ollama
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
 # Load .env file from script directory
@@ -47,154 +58,86 @@ ALTER_TRANSCRIPT_DIR = Path(os.path.expanduser(os.environ.get(
 # LLM model for processing (must be installed via: ollama pull qwen3:8b)
 LLM_MODEL = os.environ.get("LLM_MODEL", "qwen3:8b")
 
+# Smaller model for short transcripts (set empty to always use LLM_MODEL)
+LLM_MODEL_SMALL = os.environ.get("LLM_MODEL_SMALL", "qwen3:4b")
+
+# Transcripts shorter than this many characters are routed to LLM_MODEL_SMALL
+SMALL_MODEL_MAX_CHARS = 4000
+
+# How long Ollama keeps the model loaded between requests
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+
+# Maximum number of transcripts processed concurrently (match Ollama's OLLAMA_NUM_PARALLEL; 0 there means "auto", treated as 1 here)
+OLLAMA_NUM_PARALLEL = max(1, int(os.environ.get("OLLAMA_NUM_PARALLEL", "4")))
+
+# Transcripts with fewer words are sent as a stub without calling the LLM
+MIN_WORDS = int(os.environ.get("MIN_WORDS", "40"))
+
+# Approximate prompt budget in tokens - longer transcripts are condensed in chunks first
+LLM_CONTEXT_TOKENS = int(os.environ.get("LLM_CONTEXT_TOKENS", "7000"))
+
+# Ollama context window - room for the prompt budget plus instructions and the generated notes
+OLLAMA_NUM_CTX = int(os.environ.get("OLLAMA_NUM_CTX", LLM_CONTEXT_TOKENS + 4096))
+
+# Sampling and runtime options sent with every generation
+OLLAMA_OPTIONS = {
+    'num_ctx': OLLAMA_NUM_CTX,
+    'temperature': 0.2,
+    'top_p': 0.9,
+}
+# CPU threads for Ollama (unset lets Ollama pick, which skips efficiency cores on Apple Silicon)
+if os.environ.get("OLLAMA_NUM_THREAD"):
+    OLLAMA_OPTIONS['num_thread'] = int(os.environ["OLLAMA_NUM_THREAD"])
+
 # Whisper model for audio/video transcription (tiny, base, small, medium, large)
 WHISPER_MODEL = os.environ.get("WHISPER_MODEL", "base")
 
+# Whisper backend: "faster-whisper" (default) or "whispercpp" (pywhispercpp; Core ML/Metal on Apple Silicon)
+WHISPER_BACKEND = os.environ.get("WHISPER_BACKEND", "faster-whisper")
+
+# Quantized whisper.cpp models used for each size with the whispercpp backend
+WHISPER_CPP_MODELS = {
+    "tiny": "tiny-q5_1",
+    "base": "base-q5_1",
+    "small": "small-q5_1",
+    "medium": "medium-q5_0",
+    "large": "large-v3-q5_0",
+}
+
+# 30-second speech windows decoded per forward pass by the batched Whisper pipeline
+WHISPER_BATCH_SIZE = int(os.environ.get("WHISPER_BATCH_SIZE", "16"))
+
+# Parallel Whisper processes for batch imports (each worker loads its own model)
+WHISPER_WORKERS = max(1, int(os.environ.get("WHISPER_WORKERS", (os.cpu_count() or 4) // 4)))
+
 # Supported audio/video extensions
-AUDIO_VIDEO_EXTENSIONS = ('.mp3', '.mp4', '.wav', '.m4a', '.webm', '.mov', '.avi', '.mkv', '.flac', '.ogg')
+AUDIO_VIDEO_EXTENSIONS = frozenset({'.mp3', '.mp4', '.wav', '.m4a', '.webm', '.mov', '.avi', '.mkv', '.flac', '.ogg'})
 
-# Track processed files
-SYNC_STATE_FILE = Path.home() / ".meeting_notes_sync.json"
+# Supported text transcript extensions
+TEXT_EXTENSIONS = frozenset({'.txt', '.md', '.json'})
 
+# Transcripts larger than this are stream-parsed with ijson (only segment text is kept)
+STREAM_JSON_THRESHOLD = 8 * 1024 * 1024
 
-# ============= AI PROCESSING =============
+# Track processed files (append-only log, one {"path", "ts"} JSON record per line)
+SYNC_STATE_FILE = Path.home() / ".meeting_notes_sync.jsonl"
 
-class MeetingNotesProcessor:
-    """Processes transcripts with AI and sends structured notes to Capacities"""
-    
-    def __init__(self, capacities_token, space_id, llm_model, whisper_model=None):
-        self.capacities_token = capacities_token
-        self.space_id = space_id
-        self.llm_model = llm_model
-        self.whisper_model = whisper_model or WHISPER_MODEL
-        self.api_url = "https://api.capacities.io/save-to-daily-note"
-    
-    def read_transcript_file(self, file_path):
-        """Read transcript from file (supports plain text, Meetily JSON, and audio/video)"""
-        file_path = Path(file_path)
-        
-        # Handle Meetily folder structure
-        if file_path.is_dir():
-            return self._read_meetily_folder(file_path)
-        
-        # Handle audio/video files - transcribe with Whisper
-        if file_path.suffix.lower() in AUDIO_VIDEO_EXTENSIONS:
-            return self._transcribe_audio(file_path)
-        
-        # Handle plain text/markdown files
-        if file_path.suffix in ('.txt', '.md'):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        
-        # Handle JSON files (could be Meetily transcripts.json or other)
-        if file_path.suffix == '.json':
-            return self._read_json_transcript(file_path)
-        
-        return None
-    
-    def _transcribe_audio(self, file_path):
-        """Transcribe audio/video file using Whisper"""
-        try:
-            import whisper
-        except ImportError:
-            print("  ⚠️  Whisper not installed. Run: pip install openai-whisper")
-            return None
-        
-        # Check if file has audio stream
-        import subprocess
-        try:
-            result = subprocess.run(
-                ['ffprobe', '-v', 'error', '-select_streams', 'a', '-show_entries', 'stream=codec_type', '-of', 'csv=p=0', str(file_path)],
-                capture_output=True, text=True
-            )
-            if not result.stdout.strip():
-                print("  ⚠️  No audio stream found in file - cannot transcribe")
-                return None
-        except FileNotFoundError:
-            print("  ⚠️  ffmpeg not installed. Run: brew install ffmpeg")
-            return None
-        
-        print(f"  🎤 Transcribing with Whisper ({self.whisper_model} model)...")
-        print(f"     Loading model (this may take a moment on first run)...", flush=True)
-        
-        try:
-            import warnings
-            warnings.filterwarnings("ignore", category=UserWarning)
-            
-            model = whisper.load_model(self.whisper_model)
-            print(f"     Model loaded. Transcribing audio...", flush=True)
-            result = model.transcribe(str(file_path), fp16=False, verbose=False)
-            return result['text']
-        except Exception as e:
-            print(f"  ⚠️  Transcription failed: {e}")
-            return None
-    
-    def _read_meetily_folder(self, folder_path):
-        """Read transcript from Meetily folder structure"""
-        transcripts_file = folder_path / "transcripts.json"
-        
-        if not transcripts_file.exists():
-            return None
-        
-        return self._read_json_transcript(transcripts_file)
-    
-    def _read_json_transcript(self, file_path):
-        """Parse JSON transcript file"""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # Meetily format: segments array
-            if 'segments' in data:
-                segments = data.get('segments', [])
-                if segments:
-                    return " ".join(
-                        segment.get('text', '').strip()
-                        for segment in segments
-                    )
-            
-            # Generic format: look for text/transcript fields
-            for key in ('text', 'transcript', 'content'):
-                if key in data and isinstance(data[key], str):
-                    return data[key]
-            
-            return None
-        except (json.JSONDecodeError, KeyError):
-            return None
-    
-    def process_with_ai(self, transcript, context="", content_type="meeting"):
-        """Generate structured notes using local LLM"""
-        
-        context_section = ""
-        if context:
-            context_section = f"""
-CONTEXT PROVIDED BY USER:
-{context}
+# Previous whole-file JSON state, migrated into the log on first load
+LEGACY_SYNC_STATE_FILE = Path.home() / ".meeting_notes_sync.json"
 
-Use this context to help understand the content and provide more accurate summaries.
+# Cache of generated notes, keyed by prompt content and model
+NOTES_CACHE_DIR = Path.home() / ".meeting_notes_cache"
 
-"""
-        
-        if content_type == "meeting":
-            prompt = self._get_meeting_prompt(transcript, context_section)
-        else:
-            prompt = self._get_summary_prompt(transcript, context_section)
-        
-        print(f"  🤖 Processing as {content_type} with {self.llm_model}...")
-        
-        response = ollama.chat(
-            model=self.llm_model,
-            messages=[{'role': 'user', 'content': prompt}]
-        )
-        
-        return response['message']['content']
-    
-    def _get_meeting_prompt(self, transcript, context_section):
-        """Prompt for meeting recordings"""
-        return f"""Create a structured meeting summary optimized for a knowledge management system:
-{context_section}
-TRANSCRIPT:
-{transcript}
+# Bump when the prompt templates or OLLAMA_OPTIONS change so cached notes are regenerated
+PROMPT_VERSION = 5
+
+
+# ============= PROMPTS =============
+# Static instructions go in the system message so consecutive requests share a
+# prompt prefix (lets Ollama reuse its KV cache); optional context and the
+# transcript itself follow as separate user messages.
+
+MEETING_SYSTEM_PROMPT = """Create a structured meeting summary optimized for a knowledge management system.
 
 OUTPUT FORMAT:
 
@@ -272,14 +215,9 @@ STYLE GUIDELINES:
 - Focus on facts over interpretation
 - When uncertain, note "unclear from transcript"
 
-Generate the structured meeting notes now:"""
+The last user message is the transcript. Generate the structured meeting notes from it."""
 
-    def _get_summary_prompt(self, transcript, context_section):
-        """Prompt for documentaries, video essays, TED talks, and educational presentations"""
-        return f"""Create a comprehensive summary of this video content (documentary, video essay, TED talk, or presentation) optimized for a knowledge management system:
-{context_section}
-TRANSCRIPT:
-{transcript}
+SUMMARY_SYSTEM_PROMPT = """Create a comprehensive summary of this video content (documentary, video essay, TED talk, or presentation) optimized for a knowledge management system.
 
 OUTPUT FORMAT:
 
@@ -367,16 +305,518 @@ STYLE GUIDELINES:
 - Capture what makes this content compelling, not just informative
 - Help the reader understand both the content AND why it matters
 
-Generate the structured summary now:"""
+The last user message is the transcript. Generate the structured summary from it."""
+
+CHUNK_SYSTEM_PROMPT = """Condense one part of a long transcript into a detailed partial summary of that part only.
+
+Keep every speaker name, decision, action item, owner, date, number, and notable quote.
+Use concise markdown bullet points. Do not add an introduction or conclusion.
+
+The last user message is the transcript part."""
+
+
+# ============= AI PROCESSING =============
+
+
+def ext_of(path):
+    """Return the lowercased extension of a path string ('' if none)"""
+    path = str(path)
+    i = path.rfind('.')
+    if i <= max(path.rfind('/'), path.rfind(os.sep)) + 1:
+        return ''
+    return path[i:].lower()
+
+
+class MeetingNotesProcessor:
+    """Processes transcripts with AI and sends structured notes to Capacities"""
+    
+    def __init__(self, capacities_token, space_id, llm_model, whisper_model=None, llm_model_small=None,
+                 whisper_threads=0, regenerate=False):
+        self.capacities_token = capacities_token
+        self.space_id = space_id
+        self.llm_model = llm_model
+        self.llm_model_small = LLM_MODEL_SMALL if llm_model_small is None else llm_model_small
+        self.whisper_model = whisper_model or WHISPER_MODEL
+        self.whisper_threads = whisper_threads  # 0 = backend default
+        # Skip cached notes lookups (results are still written to the cache)
+        self.regenerate = regenerate
+        self.api_url = "https://api.capacities.io/save-to-daily-note"
+        # Shared Ollama client, (re)created per event loop by process_files
+        self._ollama = None
+        self._streams = 0  # generations currently streaming
+        # Caps concurrent Ollama generations, (re)created per event loop by process_files
+        self._llm_slots = None
+        self._warmed = set()  # models warm_up has already loaded
+        # Whisper model is loaded on first use and reused for every file
+        self._whisper_model = None
+        self._whisper_pipeline = None
+        self._ffprobe = shutil.which("ffprobe")
+        # Keep-alive session so consecutive uploads reuse the TLS connection
+        self._http = requests.Session()
+        self._http.headers.update({
+            "Authorization": f"Bearer {capacities_token}",
+            "Content-Type": "application/json"
+        })
+        # One host; keep as many connections as uploads that can run at once
+        self._http.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=OLLAMA_NUM_PARALLEL))
+    
+    def read_transcript_file(self, file_path):
+        """Read transcript from file (supports plain text, Meetily JSON, and audio/video)"""
+        file_path = Path(file_path)
+        
+        # Handle Meetily folder structure
+        if file_path.is_dir():
+            return self._read_meetily_folder(file_path)
+        
+        # Handle audio/video files - transcribe with Whisper
+        ext = ext_of(file_path)
+        if ext in AUDIO_VIDEO_EXTENSIONS:
+            return self._transcribe_audio(file_path)
+        
+        # Handle plain text/markdown files
+        if ext in ('.txt', '.md'):
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return f.read()
+        
+        # Handle JSON files (could be Meetily transcripts.json or other)
+        if ext == '.json':
+            return self._read_json_transcript(file_path)
+        
+        return None
+    
+    def _transcribe_audio(self, file_path):
+        """Transcribe audio/video file using Whisper"""
+        # Check if file has audio stream: header sniff, then PyAV in-process, ffprobe as a last resort
+        has_audio = self._has_audio_fast(file_path) or self._probe_audio(file_path)
+        if has_audio is None:
+            if self._ffprobe is None:
+                print("  ⚠️  ffmpeg not installed. Run: brew install ffmpeg")
+                return None
+            
+            result = subprocess.run(
+                [self._ffprobe, '-v', 'error', '-select_streams', 'a', '-show_entries', 'stream=codec_type', '-of', 'csv=p=0', str(file_path)],
+                capture_output=True, text=True
+            )
+            has_audio = bool(result.stdout.strip())
+        
+        if not has_audio:
+            print("  ⚠️  No audio stream found in file - cannot transcribe")
+            return None
+        
+        print(f"  🎤 Transcribing {file_path.name} with Whisper ({self.whisper_model} model)...")
+        
+        try:
+            if WHISPER_BACKEND == "whispercpp":
+                model = self._get_whisper_cpp_model()
+                print(f"     Transcribing audio...", flush=True)
+                segments = model.transcribe(str(file_path))
+            else:
+                pipeline = self._get_whisper_pipeline()
+                print(f"     Transcribing audio...", flush=True)
+                # Greedy decoding; VAD drops silence before it reaches the encoder
+                segments, _ = pipeline.transcribe(str(file_path), batch_size=WHISPER_BATCH_SIZE, beam_size=1, vad_filter=True)
+            return " ".join(segment.text.strip() for segment in segments)
+        except ImportError:
+            package = "pywhispercpp" if WHISPER_BACKEND == "whispercpp" else "faster-whisper"
+            print(f"  ⚠️  {package} not installed. Run: pip install {package}")
+            return None
+        except Exception as e:
+            print(f"  ⚠️  Transcription failed: {e}")
+            return None
+    
+    def _has_audio_fast(self, file_path):
+        """Detect an audio stream from the file header without launching ffprobe
+        
+        Returns True when the header identifies audio, None when undetermined
+        (e.g. video containers whose track list isn't near the start).
+        """
+        try:
+            with open(file_path, 'rb') as f:
+                header = f.read(64 * 1024)
+        except OSError:
+            return None
+        
+        # MP3 (ID3 tag or MPEG frame sync), WAV, Ogg, FLAC
+        if header[:3] == b'ID3' or (len(header) > 1 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+            return True
+        if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+            return True
+        if header[:4] in (b'OggS', b'fLaC'):
+            return True
+        # MP4/M4A/MOV with an AAC track described in a leading moov box
+        if header[4:8] == b'ftyp' and b'mp4a' in header:
+            return True
+        # Matroska/WebM with an audio codec in the track list
+        if header[:4] == b'\x1a\x45\xdf\xa3' and any(codec in header for codec in (b'A_OPUS', b'A_VORBIS', b'A_AAC')):
+            return True
+        
+        return None
+    
+    def _probe_audio(self, file_path):
+        """Check the container's stream list in-process with PyAV (installed with faster-whisper)
+        
+        Returns True/False, or None when PyAV is unavailable or can't open the file.
+        """
+        try:
+            import av
+        except ImportError:
+            return None
+        
+        try:
+            with av.open(str(file_path)) as container:
+                return any(stream.type == 'audio' for stream in container.streams)
+        except Exception:
+            # PyAV's error classes differ between versions; let ffprobe decide
+            return None
+    
+    def _get_whisper_pipeline(self):
+        """Load the Whisper model on first use and reuse it for later files
+        
+        Uses faster-whisper (CTranslate2; int8 weights on CPU, float16 on CUDA)
+        wrapped in a batched pipeline that decodes several 30-second windows per
+        forward pass.
+        """
+        if self._whisper_pipeline is None:
+            import ctranslate2
+            from faster_whisper import WhisperModel, BatchedInferencePipeline
+            
+            device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+            compute_type = "float16" if device == "cuda" else "int8"
+            
+            print(f"     Loading model (this may take a moment on first run)...", flush=True)
+            self._whisper_model = WhisperModel(
+                self.whisper_model, device=device, compute_type=compute_type, cpu_threads=self.whisper_threads
+            )
+            self._whisper_pipeline = BatchedInferencePipeline(model=self._whisper_model)
+        
+        return self._whisper_pipeline
+    
+    def _get_whisper_cpp_model(self):
+        """Load a quantized whisper.cpp model on first use (whispercpp backend)
+        
+        whisper.cpp uses Accelerate/Metal on Apple Silicon, and the Core ML encoder
+        (Neural Engine) when pywhispercpp is built with Core ML support.
+        """
+        if self._whisper_model is None:
+            from pywhispercpp.model import Model
+            
+            print(f"     Loading model (this may take a moment on first run)...", flush=True)
+            model_name = WHISPER_CPP_MODELS.get(self.whisper_model, self.whisper_model)
+            n_threads = self.whisper_threads or os.cpu_count()
+            self._whisper_model = Model(model_name, n_threads=n_threads, print_progress=False)
+        
+        return self._whisper_model
+    
+    def warm_up_whisper(self):
+        """Load Whisper and decode one second of silence so the first real file starts hot"""
+        if WHISPER_BACKEND == "whispercpp":
+            self._get_whisper_cpp_model()
+            return
+        
+        import numpy as np
+        
+        self._get_whisper_pipeline()
+        segments, _ = self._whisper_model.transcribe(np.zeros(16000, dtype=np.float32), beam_size=1)
+        list(segments)  # segments are decoded lazily
+    
+    def _read_meetily_folder(self, folder_path):
+        """Read transcript from Meetily folder structure"""
+        transcripts_file = folder_path / "transcripts.json"
+        
+        if not transcripts_file.exists():
+            return None
+        
+        return self._read_json_transcript(transcripts_file)
+    
+    def _read_json_transcript(self, file_path):
+        """Parse JSON transcript file"""
+        file_path = Path(file_path)
+        try:
+            # Very large files: avoid materializing the whole parse tree
+            if file_path.stat().st_size > STREAM_JSON_THRESHOLD:
+                text = self._stream_json_segments(file_path)
+                if text:
+                    return text
+            
+            data = orjson.loads(file_path.read_bytes())
+            
+            # Meetily format: segments array
+            if 'segments' in data:
+                segments = data.get('segments', [])
+                if segments:
+                    texts = [segment['text'] for segment in segments if 'text' in segment]
+                    return " ".join(texts).strip()
+            
+            # Generic format: look for text/transcript fields
+            for key in ('text', 'transcript', 'content'):
+                if key in data and isinstance(data[key], str):
+                    return data[key]
+            
+            return None
+        except (orjson.JSONDecodeError, KeyError):
+            return None
+    
+    def _stream_json_segments(self, file_path):
+        """Stream segment texts out of a JSON transcript without building the parse tree"""
+        try:
+            with open(file_path, 'rb') as f:
+                return " ".join(ijson.items(f, 'segments.item.text')).strip()
+        except ijson.JSONError:
+            return None
+    
+    async def process_with_ai(self, transcript, context="", content_type="meeting", source_name=""):
+        """Generate structured notes using local LLM (source_name labels the status output)"""
+        source = f" for {source_name}" if source_name else ""
+        
+        # Silent/near-empty recordings aren't worth a full generation
+        word_count = len(transcript.split())
+        if word_count < MIN_WORDS:
+            print(f"  ⏭️  Transcript{source} too short ({word_count} words), skipping AI processing")
+            if content_type == "meeting":
+                heading, placeholder = "Meeting Metadata", "Not discussed"
+            else:
+                heading, placeholder = "Overview", "Not addressed"
+            return f"""# {heading}
+{placeholder} — transcript too short ({word_count} words)
+
+# Transcript
+{transcript.strip()}"""
+        
+        # Keyed on the raw transcript, so a hit also skips condensing long ones
+        notes_key = self._notes_key(transcript, context, content_type)
+        cache_path = self._cache_path(notes_key)
+        if not self.regenerate and cache_path.exists():
+            print(f"  ♻️  Using cached {content_type} notes{source} (transcript unchanged)")
+            return cache_path.read_text(encoding='utf-8')
+        
+        # Route on the meeting's own length; condensed part summaries keep the full-size model
+        model = self._model_for(transcript)
+        
+        context_section = self._get_context_section(context)
+        condensed = await self._fit_to_context(transcript, context_section, source_name=source_name)
+        if condensed is not transcript:
+            model = self.llm_model
+        transcript = condensed
+        
+        if content_type == "meeting":
+            messages = self._get_meeting_messages(transcript, context_section)
+        else:
+            messages = self._get_summary_messages(transcript, context_section)
+        
+        return await self._generate(messages, f"{content_type} notes{source}", model, cache_key=notes_key)
+    
+    def _model_for(self, transcript):
+        """Short transcripts don't need the full-size model"""
+        if self.llm_model_small and len(transcript) < SMALL_MODEL_MAX_CHARS:
+            return self.llm_model_small
+        return self.llm_model
+    
+    async def _generate(self, messages, label, model=None, cache_key=None):
+        """Run chat messages through the LLM, reusing cached output for identical prompts
+        
+        The output is cached under cache_key when given, otherwise under the messages' hash.
+        """
+        model = model or self.llm_model
+        if cache_key is None:
+            prompt = "\0".join(f"{m['role']}:{m['content']}" for m in messages)
+            cache_key = self._cache_key(prompt, model)
+        cache_path = self._cache_path(cache_key)
+        if not self.regenerate and cache_path.exists():
+            print(f"  ♻️  Using cached {label} ({model})")
+            return cache_path.read_text(encoding='utf-8')
+        
+        if self._ollama is None:
+            self._ollama = ollama.AsyncClient()
+        if self._llm_slots is None:
+            self._llm_slots = asyncio.Semaphore(OLLAMA_NUM_PARALLEL)
+        
+        # Every generation (part summaries included) takes a slot, so Ollama never sees more
+        # than OLLAMA_NUM_PARALLEL requests however many parts the transcripts are split into
+        async with self._llm_slots:
+            print(f"  🤖 Generating {label} with {model}...")
+            text, done_reason = await self._stream_chat(model, messages)
+        
+        # Generation cut off by the context/length limit - send it, but don't cache it
+        if done_reason == "length":
+            print(f"  ⚠️  {label} hit the model's length limit and may be incomplete")
+            return text
+        
+        self._write_cache(cache_path, text)
+        return text
+    
+    async def _stream_chat(self, model, messages):
+        """Stream one chat completion, returning its text and done_reason"""
+        # Stream tokens so progress is visible while the model generates
+        stream = await self._ollama.chat(
+            model=model,
+            messages=messages,
+            stream=True,
+            options=OLLAMA_OPTIONS,
+            keep_alive=OLLAMA_KEEP_ALIVE
+        )
+        
+        buffer = io.StringIO()
+        chunk_count = 0
+        dots = False
+        done_reason = None
+        self._streams += 1
+        try:
+            async for part in stream:
+                buffer.write(part['message']['content'])
+                chunk_count += 1
+                # Progress dots only while this is the sole stream, so concurrent ones don't interleave
+                if chunk_count % 100 == 0 and self._streams == 1:
+                    print(".", end="", flush=True)
+                    dots = True
+                if part.get('done'):
+                    done_reason = part.get('done_reason')
+        finally:
+            self._streams -= 1
+        if dots:
+            print()
+        
+        return buffer.getvalue(), done_reason
+    
+    async def _fit_to_context(self, transcript, context_section, max_tokens=LLM_CONTEXT_TOKENS, source_name=""):
+        """Condense a transcript that would overflow the model's context window
+        
+        The transcript is split into chunks that are summarized concurrently;
+        the joined partial summaries stand in for the transcript in the final prompt.
+        """
+        max_chars = max_tokens * 4  # ~4 characters per token
+        if len(transcript) <= max_chars:
+            return transcript
+        
+        chunks = self._split_text(transcript, max_chars)
+        source = f" of {source_name}" if source_name else ""
+        print(f"  ✂️  Transcript{source} exceeds ~{max_tokens} tokens, condensing {len(chunks)} parts first...")
+        
+        partials = await asyncio.gather(*(
+            self._generate(
+                self._get_chunk_messages(chunk, index, len(chunks), context_section),
+                f"part {index}/{len(chunks)} summary{source}"
+            )
+            for index, chunk in enumerate(chunks, start=1)
+        ))
+        condensed = "\n\n".join(
+            f"[Part {index}/{len(chunks)}]\n{partial.strip()}"
+            for index, partial in enumerate(partials, start=1)
+        )
+        
+        # Very long recordings may need another round; stop if summaries stop shrinking
+        if len(condensed) < len(transcript):
+            return await self._fit_to_context(condensed, context_section, max_tokens, source_name)
+        return condensed[:max_chars]
+    
+    def _split_text(self, text, max_chars):
+        """Split text into chunks of at most max_chars, breaking on whitespace"""
+        chunks = []
+        start = 0
+        while start < len(text):
+            end = start + max_chars
+            if end < len(text):
+                space = text.rfind(" ", start, end)
+                if space > start:
+                    end = space
+            chunks.append(text[start:end].strip())
+            start = end
+        return [chunk for chunk in chunks if chunk]
+    
+    def warm_up(self, transcript, context, content_type):
+        """Load the model a transcript will use in the background, ahead of its first request
+        
+        Skipped when no generation will run (stub or cached notes) and for models
+        already loaded this run, so only models that are actually needed stay resident.
+        """
+        if len(transcript.split()) < MIN_WORDS:
+            return
+        if not self.regenerate and self._cache_path(self._notes_key(transcript, context, content_type)).exists():
+            return
+        model = self._model_for(transcript)
+        if model in self._warmed:
+            return
+        self._warmed.add(model)
+        
+        def load():
+            try:
+                ollama.chat(
+                    model=model,
+                    messages=[{'role': 'user', 'content': 'ok'}],
+                    # Same num_ctx as real requests, or Ollama reloads the model on the first one
+                    options={**OLLAMA_OPTIONS, 'num_predict': 1},
+                    keep_alive=OLLAMA_KEEP_ALIVE
+                )
+            except Exception:
+                pass
+        
+        threading.Thread(target=load, daemon=True).start()
+    
+    def _cache_key(self, prompt, model):
+        """Cache key for a prompt (covers transcript, context and template) and model"""
+        digest = hashlib.blake2b(prompt.encode('utf-8'), digest_size=16).hexdigest()
+        model = model.replace('/', '_').replace(':', '_')
+        return f"{digest}-{model}-v{PROMPT_VERSION}"
+    
+    def _notes_key(self, transcript, context, content_type):
+        """Cache key for final notes, from the transcript before condensing and routing"""
+        models = self.llm_model
+        if self.llm_model_small:
+            models = f"{models}+{self.llm_model_small}"
+        return self._cache_key("\0".join((content_type, context, transcript)), models)
+    
+    def _cache_path(self, key):
+        """Location of cached notes for a cache key"""
+        return NOTES_CACHE_DIR / f"{key}.md"
+    
+    def _write_cache(self, cache_path, notes):
+        """Atomically write notes to the cache (failures are non-fatal)"""
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_path.parent, suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(notes)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"  ⚠️  Could not cache notes: {e}")
+    
+    def _get_context_section(self, context):
+        """Prompt section carrying user-provided context"""
+        if not context:
+            return ""
+        return f"""CONTEXT PROVIDED BY USER:
+{context}
+
+Use this context to help understand the content and provide more accurate summaries.
+
+"""
+    
+    def _get_messages(self, system_prompt, transcript, context_section, preamble=""):
+        """Chat messages: static system prompt, optional context, then the transcript verbatim
+        
+        The transcript is its own message so it is never copied into a larger prompt string.
+        """
+        messages = [{'role': 'system', 'content': system_prompt}]
+        details = (preamble + context_section).strip()
+        if details:
+            messages.append({'role': 'user', 'content': details})
+        messages.append({'role': 'user', 'content': transcript})
+        return messages
+    
+    def _get_chunk_messages(self, chunk, index, total, context_section):
+        """Messages for condensing one part of an over-long transcript"""
+        return self._get_messages(CHUNK_SYSTEM_PROMPT, chunk, context_section, f"This is part {index} of {total}.\n\n")
+    
+    def _get_meeting_messages(self, transcript, context_section):
+        """Messages for meeting recordings"""
+        return self._get_messages(MEETING_SYSTEM_PROMPT, transcript, context_section)
+
+    def _get_summary_messages(self, transcript, context_section):
+        """Messages for documentaries, video essays, TED talks, and educational presentations"""
+        return self._get_messages(SUMMARY_SYSTEM_PROMPT, transcript, context_section)
     
     def send_to_capacities(self, notes, source_name):
         """Send structured notes to Capacities via API"""
         
-        headers = {
-            "Authorization": f"Bearer {self.capacities_token}",
-            "Content-Type": "application/json"
-        }
-        
         formatted_notes = notes
         
         payload = {
@@ -385,9 +825,8 @@ Generate the structured summary now:"""
         }
         
         try:
-            response = requests.post(
+            response = self._http.post(
                 self.api_url,
-                headers=headers,
                 json=payload,
                 timeout=30
             )
@@ -402,57 +841,229 @@ Generate the structured summary now:"""
             print(f"  ❌ Network error: {e}")
             return False
     
-    def process_transcript(self, file_path, context="", content_type="meeting"):
-        """Complete processing pipeline for a single transcript"""
+    def load_transcript(self, file_path):
+        """Read a transcript for processing, returning None if empty or unreadable"""
         file_path = Path(file_path)
-        source_name = file_path.name
         
         print(f"\n{'='*60}")
-        print(f"Processing: {source_name}")
+        print(f"Processing: {file_path.name}")
         print(f"{'='*60}")
         
         try:
-            # Read transcript
             print("  📄 Reading transcript...")
             transcript = self.read_transcript_file(file_path)
-            
-            if not transcript or not transcript.strip():
-                print("  ⚠️  Empty or unreadable transcript, skipping")
+        except Exception as e:
+            print(f"  ❌ Error reading {file_path.name}: {str(e)}")
+            return None
+        
+        if not transcript or not transcript.strip():
+            print(f"  ⚠️  Empty or unreadable transcript {file_path.name}, skipping")
+            return None
+        
+        return transcript
+    
+    async def process_files(self, file_paths, context="", content_type="meeting"):
+        """Read, summarize and upload files as an overlapping pipeline
+        
+        Transcripts are read/transcribed by a reader pool and each one moves on to
+        the LLM (bounded by OLLAMA_NUM_PARALLEL) and upload stages as soon as it
+        is ready, so Whisper works on the next file while Ollama summarizes the
+        previous one. Returns success flags in input order.
+        """
+        self._ollama = ollama.AsyncClient()
+        self._llm_slots = asyncio.Semaphore(OLLAMA_NUM_PARALLEL)
+        await self._check_small_model()
+        semaphore = asyncio.Semaphore(OLLAMA_NUM_PARALLEL)
+        loop = asyncio.get_running_loop()
+        
+        audio_paths = {p for p in file_paths if ext_of(p) in AUDIO_VIDEO_EXTENSIONS}
+        workers = min(WHISPER_WORKERS, len(audio_paths))
+        # Text transcripts are always read in-process so the LLM can start on them right away
+        reader = ThreadPoolExecutor(max_workers=1)
+        audio_reader = None
+        if workers > 1:
+            # Split the cores between workers so they don't oversubscribe the CPU
+            threads = max(1, (os.cpu_count() or 4) // workers)
+            print(f"\n🎤 Transcribing {len(audio_paths)} files with {workers} Whisper workers...")
+            audio_reader = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_transcription_worker,
+                initargs=(self.whisper_model, threads)
+            )
+        
+        def submit(file_path):
+            if audio_reader is not None and file_path in audio_paths:
+                return loop.run_in_executor(audio_reader, _load_transcript_in_worker, file_path)
+            return loop.run_in_executor(reader, self.load_transcript, file_path)
+        
+        async def run(file_path, transcript_future):
+            try:
+                transcript = await transcript_future
+            except Exception as e:
+                print(f"  ❌ Error reading {Path(file_path).name}: {str(e)}")
                 return False
+            if transcript is None:
+                return False
+            self.warm_up(transcript, context, content_type)
+            async with semaphore:
+                return await self._process_one(file_path, transcript, context, content_type)
+        
+        try:
+            futures = {file_path: submit(file_path) for file_path in self._reading_order(file_paths)}
+            return await asyncio.gather(*(run(p, futures[p]) for p in file_paths))
+        finally:
+            reader.shutdown()
+            if audio_reader is not None:
+                audio_reader.shutdown()
+    
+    def _reading_order(self, file_paths):
+        """Order files for submission to the readers
+        
+        Text transcripts come first so the LLM starts right away; audio follows
+        longest first (file size as a cheap duration proxy) so parallel workers
+        finish together instead of idling behind one long file. With Whisper
+        workers, only audio goes to the process pool; text stays in-process.
+        """
+        def key(file_path):
+            if ext_of(file_path) not in AUDIO_VIDEO_EXTENSIONS:
+                return (0, 0)
+            try:
+                return (1, -os.path.getsize(file_path))
+            except OSError:
+                return (1, 0)
+        
+        return sorted(file_paths, key=key)
+    
+    async def _check_small_model(self):
+        """Fall back to the main model (with a warning) if the small model isn't pulled"""
+        if not self.llm_model_small or self.llm_model_small == self.llm_model:
+            return
+        
+        def with_tag(name):
+            return name if ':' in name else f"{name}:latest"
+        
+        try:
+            response = await self._ollama.list()
+            installed = {with_tag(m.get('model') or m.get('name') or '') for m in response['models']}
+        except Exception:
+            return
+        
+        if with_tag(self.llm_model_small) not in installed:
+            print(f"⚠️  Small model {self.llm_model_small} not installed, using {self.llm_model} for all transcripts")
+            print(f"   (Run: ollama pull {self.llm_model_small})")
+            self.llm_model_small = ""
+    
+    async def _process_one(self, file_path, transcript, context, content_type):
+        """Generate and send notes for one transcript"""
+        source_name = Path(file_path).name
+        
+        try:
+            notes = await self.process_with_ai(transcript, context, content_type, source_name)
             
-            # Process with AI
-            notes = self.process_with_ai(transcript, context, content_type)
-            
-            # Send to Capacities
-            print("  📤 Sending to Capacities...")
-            if self.send_to_capacities(notes, source_name):
-                print("  ✅ Successfully sent to Capacities!")
+            print(f"  📤 Sending {source_name} to Capacities...")
+            if await asyncio.to_thread(self.send_to_capacities, notes, source_name):
+                print(f"  ✅ Successfully sent {source_name} to Capacities!")
+                # Record right away so an interrupted scan doesn't upload it again
+                append_sync_state([file_path])
                 return True
             
             return False
             
         except Exception as e:
-            print(f"  ❌ Error: {str(e)}")
+            print(f"  ❌ Error processing {source_name}: {str(e)}")
             return False
+    
+    def process_transcript(self, file_path, context="", content_type="meeting"):
+        """Complete processing pipeline for a single transcript"""
+        results = asyncio.run(self.process_files([file_path], context, content_type))
+        return results[0]
+
+
+# ============= TRANSCRIPTION WORKERS =============
+
+_worker_processor = None
+
+
+def _init_transcription_worker(whisper_model, whisper_threads):
+    """Process pool initializer: one processor (and Whisper model) per worker"""
+    global _worker_processor
+    _worker_processor = MeetingNotesProcessor(
+        None, None, None, whisper_model=whisper_model, whisper_threads=whisper_threads
+    )
+    try:
+        _worker_processor.warm_up_whisper()
+    except Exception:
+        # Missing/broken installs are reported per file by _transcribe_audio
+        pass
+
+
+def _load_transcript_in_worker(file_path):
+    """Read/transcribe a single file inside a pool worker"""
+    return _worker_processor.load_transcript(file_path)
 
 
 # ============= SYNC STATE =============
 
 def load_sync_state():
     """Load set of already-processed files"""
-    if SYNC_STATE_FILE.exists():
+    processed = {}  # path -> processed timestamp (None when unknown)
+    line_count = 0
+    
+    legacy = LEGACY_SYNC_STATE_FILE.exists()
+    if legacy:
         try:
-            with open(SYNC_STATE_FILE, 'r') as f:
-                return set(json.load(f))
+            with open(LEGACY_SYNC_STATE_FILE, 'r') as f:
+                processed.update(dict.fromkeys(json.load(f)))
         except:
             pass
-    return set()
+    
+    if SYNC_STATE_FILE.exists():
+        with open(SYNC_STATE_FILE, 'r', encoding='utf-8') as f:
+            for line in f:
+                line_count += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn last line from an interrupted write
+                    continue
+                if isinstance(record, dict) and isinstance(record.get('path'), str):
+                    processed[record['path']] = record.get('ts')
+                elif isinstance(record, str):
+                    processed[record] = None  # early logs stored bare paths
+                # Anything else is a malformed record; skip it like a torn line
+    
+    # Compact once duplicates dominate the log, or to migrate legacy state
+    if legacy or line_count > 2 * len(processed):
+        compact_sync_state(processed)
+        if legacy:
+            LEGACY_SYNC_STATE_FILE.unlink()
+    
+    return set(processed)
+
+
+def _sync_record(file_path, ts):
+    """One sync log line"""
+    record = {"path": file_path}
+    if ts is not None:
+        record["ts"] = ts
+    return json.dumps(record) + "\n"
 
 
-def save_sync_state(processed_files):
-    """Save processed files to disk"""
-    with open(SYNC_STATE_FILE, 'w') as f:
-        json.dump(list(processed_files), f, indent=2)
+def append_sync_state(file_paths):
+    """Record newly processed files by appending to the sync log"""
+    now = time.time()
+    with open(SYNC_STATE_FILE, 'a', encoding='utf-8') as f:
+        f.writelines(_sync_record(file_path, now) for file_path in file_paths)
+
+
+def compact_sync_state(processed):
+    """Rewrite the sync log with one line per file (atomic and fsynced)"""
+    tmp_path = SYNC_STATE_FILE.with_suffix(".jsonl.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.writelines(_sync_record(file_path, processed[file_path]) for file_path in sorted(processed))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, SYNC_STATE_FILE)
 
 
 # ============= MAIN =============
@@ -486,6 +1097,8 @@ def main():
                         help="Content type: 'meeting' for meeting notes, 'summary' for general video/audio summaries")
     parser.add_argument("--model", type=str, choices=["tiny", "base", "small", "medium", "large"], default=WHISPER_MODEL,
                         help="Whisper model size for audio transcription (default: base)")
+    parser.add_argument("--regenerate", action="store_true",
+                        help=f"Ignore cached notes in {NOTES_CACHE_DIR} and run the LLM again")
     args = parser.parse_args()
     
     context = args.context
@@ -497,7 +1110,8 @@ def main():
         capacities_token=CAPACITIES_TOKEN,
         space_id=CAPACITIES_SPACE_ID,
         llm_model=LLM_MODEL,
-        whisper_model=whisper_model
+        whisper_model=whisper_model,
+        regenerate=args.regenerate
     )
     
     # Single file mode
@@ -507,8 +1121,6 @@ def main():
         print(f"📋 Content type: {content_type}")
         
         if processor.process_transcript(file_path, context, content_type):
-            processed_files.add(file_path)
-            save_sync_state(processed_files)
             print("\n✨ Done!")
         else:
             sys.exit(1)
@@ -524,31 +1136,28 @@ def main():
     print(f"📊 Previously processed: {len(processed_files)} files")
     print("=" * 60)
     
-    total_found = 0
+    candidates = []
     
     # Scan Meetily recordings directory for folders with transcripts (if available)
     if TRANSCRIPT_DIR.exists():
         print(f"\n🔍 Scanning Meetily recordings: {TRANSCRIPT_DIR}")
-        for item in TRANSCRIPT_DIR.iterdir():
-            if item.is_dir():
-                transcripts_file = item / "transcripts.json"
-                metadata_file = item / "metadata.json"
+        with os.scandir(TRANSCRIPT_DIR) as it:
+            for entry in it:
+                # Cheap checks first: processed set, then the cached dirent type
+                if entry.path in processed_files or not entry.is_dir():
+                    continue
                 
-                if transcripts_file.exists() and metadata_file.exists():
-                    # Check if meeting is completed
-                    try:
-                        with open(metadata_file, 'r') as f:
-                            metadata = json.load(f)
-                        if metadata.get('status') != 'completed':
-                            continue
-                    except:
+                # Reading metadata doubles as its existence check
+                try:
+                    raw = Path(entry.path, "metadata.json").read_bytes()
+                    # Check if meeting is completed (byte scan rejects most others without parsing)
+                    if b'completed' not in raw or orjson.loads(raw).get('status') != 'completed':
                         continue
-                    
-                    if str(item) not in processed_files:
-                        total_found += 1
-                        if processor.process_transcript(item, context, content_type):
-                            processed_files.add(str(item))
-                            save_sync_state(processed_files)
+                except Exception:
+                    continue
+                
+                if os.path.exists(os.path.join(entry.path, "transcripts.json")):
+                    candidates.append(entry.path)
     else:
         print(f"\nℹ️ Meetily transcript directory not found, skipping: {TRANSCRIPT_DIR}")
     
@@ -556,23 +1165,28 @@ def main():
     if ALTER_TRANSCRIPT_DIR.exists():
         print(f"\n🔍 Scanning Alter transcripts: {ALTER_TRANSCRIPT_DIR}")
         for file_path in ALTER_TRANSCRIPT_DIR.rglob("*"):
-            if file_path.is_file() and file_path.suffix.lower() in (".txt", ".md", ".json"):
-                if str(file_path) not in processed_files:
-                    total_found += 1
-                    if processor.process_transcript(file_path, context, content_type):
-                        processed_files.add(str(file_path))
-                        save_sync_state(processed_files)
+            # Processed set and extension first; only new transcripts cost a stat
+            path = str(file_path)
+            if path in processed_files or ext_of(file_path.name) not in TEXT_EXTENSIONS:
+                continue
+            if file_path.is_file():
+                candidates.append(path)
     
     # Scan import directory for audio/video files
     if IMPORT_DIR.exists():
         print(f"\n🔍 Scanning import folder: {IMPORT_DIR}")
-        for file_path in IMPORT_DIR.iterdir():
-            if file_path.suffix.lower() in AUDIO_VIDEO_EXTENSIONS:
-                if str(file_path) not in processed_files:
-                    total_found += 1
-                    if processor.process_transcript(file_path, context, content_type):
-                        processed_files.add(str(file_path))
-                        save_sync_state(processed_files)
+        with os.scandir(IMPORT_DIR) as it:
+            for entry in it:
+                if entry.path in processed_files or not entry.is_file():
+                    continue
+                if ext_of(entry.name) in AUDIO_VIDEO_EXTENSIONS:
+                    candidates.append(entry.path)
+    
+    total_found = len(candidates)
+    
+    # Transcribe, summarize and upload as a pipeline (each upload is recorded as it succeeds)
+    if candidates:
+        asyncio.run(processor.process_files(candidates, context, content_type))
     
     print("\n" + "=" * 60)
     if total_found == 0:
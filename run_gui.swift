@@ -197,15 +197,28 @@ class AppDelegate: NSObject, NSApplicationDelegate {
         appendOutput("🔍 Scanning for new recordings...\n\n")
         
         // Load processed files
-        let syncStateFile = FileManager.default.homeDirectoryForCurrentUser
-            .appendingPathComponent(".meeting_notes_sync.json")
+        let homeDir = FileManager.default.homeDirectoryForCurrentUser
         var processedFiles: Set<String> = []
         
-        if let data = try? Data(contentsOf: syncStateFile),
+        // Legacy state file (JSON array), until the processor migrates it
+        if let data = try? Data(contentsOf: homeDir.appendingPathComponent(".meeting_notes_sync.json")),
            let files = try? JSONDecoder().decode([String].self, from: data) {
             processedFiles = Set(files)
         }
         
+        // Append-only log: one {"path": ..., "ts": ...} record (or bare path string) per line
+        if let log = try? String(contentsOf: homeDir.appendingPathComponent(".meeting_notes_sync.jsonl"), encoding: .utf8) {
+            for line in log.split(separator: "\n") {
+                guard let data = line.data(using: .utf8),
+                      let record = try? JSONSerialization.jsonObject(with: data, options: .fragmentsAllowed) else { continue }
+                if let entry = record as? [String: Any], let path = entry["path"] as? String {
+                    processedFiles.insert(path)
+                } else if let path = record as? String {
+                    processedFiles.insert(path)
+                }
+            }
+        }
+        
         // Load transcript directory from .env
         let envFile = URL(fileURLWithPath: scriptDir).appendingPathComponent(".env")
         var transcriptDir = FileManager.default.homeDirectoryForCurrentUser